@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+""" Times the expensive parts of generating a novel on a synthetic corpus, and
+compares the results against a stored baseline.
+
+    python3 benchmark.py --sizes 1000 10000 --save-baseline
+    python3 benchmark.py --sizes 1000 10000 # fails if anything regressed
+
+Timings only compare on the same machine, so the baseline is not committed:
+save one locally (benchmark_baseline.json, ignored by git) before changing
+anything, or point --baseline at one kept for a CI machine. Without a baseline
+for every result, the comparison fails unless --allow-missing-baseline is given.
+"""
+
+import argparse, json, os, random, sys, time, tracemalloc
+
+import chapter, phrases
+
+BASELINE_FILE = "benchmark_baseline.json"
+SIZES = [1000, 10000, 100000, 1000000]
+
+WORDS = ("the soul form body virtue knowledge good life reason wisdom truth justice "
+         "state citizen nature cause motion substance being thought argument").split()
+VERBS = "is can must should cannot proves implies resembles".split()
+NAMES = "Socrates Aristotle Plato Hume Kant Descartes".split()
+
+
+def synthetic_sentence(rng):
+    words = [rng.choice(WORDS) for i in range(rng.randint(3, 12))]
+    words.insert(rng.randrange(1, len(words)), rng.choice(VERBS))
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), rng.choice(NAMES))
+    if rng.random() < 0.1:
+        words.insert(rng.randrange(len(words)), "doesn't")
+    if rng.random() < 0.2:
+        at = rng.randrange(len(words))
+        words[at:at] = ["(that", "is,", rng.choice(WORDS) + ")"]
+    if rng.random() < 0.25:
+        words.append("({} {})".format(rng.choice(NAMES), rng.randrange(1600, 2016)))
+
+    sentence = " ".join(words)
+    sentence = sentence[0].upper() + sentence[1:]
+    if rng.random() < 0.05:
+        sentence = "{}. {}".format(rng.randrange(1, 30), sentence)
+    return sentence + ("?" if rng.random() < 0.3 else ".")
+
+
+def synthetic_document(rng):
+    if rng.random() < 0.02:
+        return "Too short.\n" # dropped by remove_empty_docs
+
+    sentences = [synthetic_sentence(rng) for i in range(rng.randint(1, 6))]
+    document = ""
+    for sentence in sentences:
+        document += sentence + ("\t" if rng.random() < 0.1 else " ")
+    return document.strip() + "\n"
+
+
+def synthetic_documents(count, seed=0):
+    """ the same count and seed always give the same documents, one per line """
+    rng = random.Random(seed)
+    return [synthetic_document(rng) for i in range(count)]
+
+
+def trained_corpus(docs):
+    corpus = phrases.Corpus()
+    for doc in docs:
+        corpus.add_document(doc)
+    return corpus
+
+
+# each benchmark does its setup and returns the function to be measured
+
+def bench_add_document(docs):
+    corpus = phrases.Corpus()
+    return lambda: [corpus.add_document(doc) for doc in docs]
+
+def bench_generate_sentence(docs, sentences=200):
+    corpus = trained_corpus(docs)
+    return lambda: [corpus.generate_sentence(i % 3) for i in range(sentences)]
+
+def bench_fix_casing(docs):
+    return trained_corpus(docs).fix_casing
+
+def bench_delete(docs):
+    corpus = trained_corpus(docs)
+    return lambda: [corpus.counts.delete(key) for key in ("\\", "\\\\", "\\1", "the")]
+
+def bench_generate_from_documents(docs):
+    return lambda: chapter.ChapterGenerator.generate_from_documents(docs)
+
+def bench_render(docs, chapters=3):
+    import novel # loads the templates relative to the working directory
+    generated = []
+    for i in range(chapters):
+        gen = chapter.ChapterGenerator.generate_from_documents(docs)
+        generated.append(chapter.Chapter(gen.phrases, gen.generate_title(), gen.word_count))
+    book = novel.Novel(generated)
+    return book.render
+
+BENCHMARKS = {
+    "add_document": bench_add_document,
+    "generate_sentence": bench_generate_sentence,
+    "fix_casing": bench_fix_casing,
+    "delete": bench_delete,
+    "generate_from_documents": bench_generate_from_documents,
+    "render": bench_render,
+}
+
+
+def measure(setup, docs, repeat=3, seed=0):
+    """ returns the best time of repeat runs, and the peak memory allocated
+    during one more run """
+    best = None
+    for i in range(repeat):
+        random.seed(seed)
+        run = setup(docs)
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    random.seed(seed)
+    run = setup(docs)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"seconds": best, "peak_bytes": peak}
+
+
+def run_benchmarks(sizes, names, repeat=3, seed=0):
+    results = {}
+    for size in sizes:
+        docs = synthetic_documents(size, seed)
+        for name in names:
+            key = "{}/{}".format(name, size)
+            results[key] = measure(BENCHMARKS[name], docs, repeat, seed)
+            print("{:<32} {:>10.4f}s {:>10.1f}KiB".format(
+                key, results[key]["seconds"], results[key]["peak_bytes"] / 1024), file=sys.stderr)
+    return results
+
+
+def object_bytes(obj):
+    return sys.getsizeof(obj) + (sys.getsizeof(obj.__dict__) if hasattr(obj, '__dict__') else 0)
+
+
+class UnslottedSentiment(object):
+    """ a Sentiment as it was before it had __slots__ """
+
+    def __init__(self, sentiment):
+        for name in chapter.Sentiment.__slots__:
+            setattr(self, name, getattr(sentiment, name))
+
+class UnslottedPhrase(object):
+    """ a DialoguePhrase as it was before it had __slots__. Each class keeps its
+    own, so instances can share their __dict__ keys like the originals did """
+
+    def __init__(self, phrase):
+        for name in chapter.DialoguePhrase.__slots__:
+            setattr(self, name, getattr(phrase, name))
+        self.sentiment = UnslottedSentiment(phrase.sentiment)
+
+
+def dialog_memory(docs, count=1000, seed=0):
+    """ returns the bytes taken by count generated phrases, not counting their
+    text: as a list of DialoguePhrase with a __dict__ each, as a list of the
+    slotted DialoguePhrase, and as a chapter.Dialog """
+    random.seed(seed)
+    dialog = []
+    while len(dialog) < count:
+        dialog.extend(chapter.ChapterGenerator.generate_from_documents(docs).phrases)
+    dialog = dialog[:count]
+
+    unslotted = [UnslottedPhrase(p) for p in dialog]
+    as_dicts = sys.getsizeof(unslotted) + sum(object_bytes(p) + object_bytes(p.sentiment) for p in unslotted)
+    as_slots = sys.getsizeof(dialog) + sum(object_bytes(p) + object_bytes(p.sentiment) for p in dialog)
+    columns = chapter.Dialog(dialog)
+    as_columns = object_bytes(columns) + sum(sys.getsizeof(column) for column in vars(columns).values())
+    return as_dicts, as_slots, as_columns
+
+
+def find_regressions(baseline, results, time_threshold=0.25, memory_threshold=0.25):
+    """ returns a description of every result that is slower or bigger than its
+    baseline by more than the threshold, as a fraction of the baseline """
+    regressions = []
+    for key, result in sorted(results.items()):
+        if key not in baseline:
+            continue
+        for metric, threshold in (("seconds", time_threshold), ("peak_bytes", memory_threshold)):
+            before, after = baseline[key][metric], result[metric]
+            if before > 0 and after > before * (1 + threshold):
+                regressions.append("{} {}: {:.4g} -> {:.4g} (+{:.0%})".format(
+                    key, metric, before, after, after / before - 1))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="benchmark novel generation on a synthetic corpus")
+    parser.add_argument("--sizes", type=int, nargs='+', default=SIZES[:2],
+                        help="numbers of documents to benchmark, eg. {}".format(" ".join(map(str, SIZES))))
+    parser.add_argument("--only", nargs='+', choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--allow-missing-baseline", action='store_true',
+                        help="pass when the baseline has no results to compare with, instead of failing")
+    parser.add_argument("--save-baseline", action='store_true',
+                        help="store these results as the new baseline instead of comparing")
+    parser.add_argument("--time-threshold", type=float, default=0.25,
+                        help="fraction slower than the baseline that counts as a regression")
+    parser.add_argument("--memory-threshold", type=float, default=0.25,
+                        help="fraction more peak memory than the baseline that counts as a regression")
+    parser.add_argument("--write-corpus", metavar="FILE",
+                        help="only write the synthetic corpus of the first size to FILE")
+    parser.add_argument("--dialog-memory", action='store_true',
+                        help="only report the memory taken by 1000 phrases of dialog")
+    args = parser.parse_args()
+
+    if args.dialog_memory:
+        as_dicts, as_slots, as_columns = dialog_memory(synthetic_documents(args.sizes[0], args.seed), seed=args.seed)
+        print("per 1000 phrases: {:.1f}KiB as DialoguePhrases with a __dict__, {:.1f}KiB with __slots__, "
+              "{:.1f}KiB as a Dialog".format(as_dicts / 1024, as_slots / 1024, as_columns / 1024), file=sys.stderr)
+        sys.exit(0)
+
+    if args.write_corpus:
+        with open(args.write_corpus, 'w') as out:
+            out.writelines(synthetic_documents(args.sizes[0], args.seed))
+        sys.exit(0)
+
+    if not args.save_baseline and not args.allow_missing_baseline and not os.path.exists(args.baseline):
+        print("no baseline at {}, run with --save-baseline first".format(args.baseline), file=sys.stderr)
+        sys.exit(2)
+
+    results = run_benchmarks(args.sizes, args.only, args.repeat, args.seed)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print("saved baseline to {}".format(args.baseline), file=sys.stderr)
+        sys.exit(0)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    missing = sorted(key for key in results if key not in baseline)
+    for key in missing:
+        print("NO BASELINE " + key, file=sys.stderr)
+
+    regressions = find_regressions(baseline, results, args.time_threshold, args.memory_threshold)
+    for regression in regressions:
+        print("REGRESSION " + regression, file=sys.stderr)
+
+    if regressions:
+        sys.exit(1)
+    if missing and not args.allow_missing_baseline:
+        sys.exit(2)
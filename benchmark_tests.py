@@ -0,0 +1,32 @@
+import benchmark
+
+from nose.tools import *
+
+
+def test_synthetic_documents_are_deterministic():
+    eq_(benchmark.synthetic_documents(50, seed=1), benchmark.synthetic_documents(50, seed=1))
+    ok_(benchmark.synthetic_documents(50, seed=1) != benchmark.synthetic_documents(50, seed=2))
+
+
+def test_synthetic_documents_are_messy():
+    docs = benchmark.synthetic_documents(500)
+    eq_(len(docs), 500)
+    ok_(all(doc.endswith("\n") and doc.count("\n") == 1 for doc in docs))
+    ok_(any("\t" in doc for doc in docs))
+    ok_(any("?" in doc for doc in docs))
+    ok_(any("(that is," in doc for doc in docs))
+    ok_(any(" 1" in doc and ")" in doc for doc in docs)) # citations like (Kant 1781)
+
+
+def test_find_regressions():
+    baseline = {"a/10": {"seconds": 1.0, "peak_bytes": 100}}
+
+    eq_(benchmark.find_regressions(baseline, {"a/10": {"seconds": 1.2, "peak_bytes": 100}}), [])
+    eq_(len(benchmark.find_regressions(baseline, {"a/10": {"seconds": 1.3, "peak_bytes": 100}})), 1)
+    eq_(len(benchmark.find_regressions(baseline, {"a/10": {"seconds": 2, "peak_bytes": 200}}, 0.5, 0.5)), 2)
+    eq_(benchmark.find_regressions(baseline, {"b/10": {"seconds": 5, "peak_bytes": 500}}), [])
+
+
+def test_dialog_memory_shrinks():
+    as_dicts, as_slots, as_columns = benchmark.dialog_memory(benchmark.synthetic_documents(50), count=100)
+    ok_(as_dicts > as_slots > as_columns)
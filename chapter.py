@@ -1,7 +1,8 @@
-import cleaners, phrases
+import cleaners, corpusfile, phrases
 from conversation import *
 
-import fileinput, math, random
+import contextlib, math, random, sys
+from array import array
 
 
 def choose_with_probability(a, b, prob):
@@ -31,6 +32,8 @@ class UniformPicker(object):
 
 
 class Sentiment(object):
+    __slots__ = ('mocking', 'confirming', 'excitement', 'repeating', 'interrupting')
+
     def __init__(self, mocking = 0, confirming = 0, excitement = 0, repeating = 0):
         self.mocking = mocking
         self.confirming = confirming
@@ -139,6 +142,8 @@ Sentiment.DIRECTIONS = {
 
 
 class DialoguePhrase(object):
+    __slots__ = ('phrase', 'interrupted', 'phrase_type', 'actor', 'sentiment', 'direction')
+
     def __init__(self, phrase, phrase_type, actor):
         self.phrase = phrase.detokenized
         self.interrupted = phrase.interrupted
@@ -153,11 +158,13 @@ class DialoguePhrase(object):
         return DialoguePhrase(phrases.GeneratedSentence("", 0, False), phrases.FACT, actor)
 
 class ChapterGenerator(object):
-    def __init__(self):
-        self.teacher = phrases.Corpus()
+    def __init__(self, corpus_class=phrases.Corpus, student_class=None):
+        """ corpus_class makes the teacher's corpus, and the student's too unless
+        student_class is given. See the README for using shared, frozen models. """
+        self.teacher = corpus_class()
         add_teacher_conversation(self.teacher)
 
-        self.student = phrases.Corpus()
+        self.student = (student_class or corpus_class)()
         add_student_conversation(self.student)
 
         self.phrases = []
@@ -213,7 +220,7 @@ class ChapterGenerator(object):
         return self.student.generate_sentence(phrases.QUESTION).detokenized
 
     @staticmethod
-    def generate_from_documents(docs):
+    def generate_from_documents(docs, corpus_class=phrases.Corpus, student_class=None):
         pickers = [UniformPicker() for i in range(10)]
 
         docs = cleaners.remove_empty_docs(docs)
@@ -221,7 +228,7 @@ class ChapterGenerator(object):
             for p in pickers:
                 p.add(doc)
 
-        gen = ChapterGenerator()
+        gen = ChapterGenerator(corpus_class, student_class)
 
         for p in pickers[:-3]:
             # teach twice for higher probability of using this text
@@ -249,22 +256,116 @@ class ChapterGenerator(object):
         return gen
 
 
+class Dialog(object):
+    """ The phrases of a finished chapter, stored by column instead of as one
+    DialoguePhrase (and Sentiment) each. Actors and directions are interned, and
+    everything but the phrase text is kept in small int arrays.
+
+    Iterating gives a DialogueRow per phrase, which has the same attributes as a
+    DialoguePhrase, so the templates can use either one. """
+
+    def __init__(self, dialog=()):
+        self.phrases = []
+        self.actor_names = []
+        self.direction_names = []
+        self.actors = array('B')
+        self.directions = array('B')
+        self.phrase_types = array('b')
+        self.interrupted = array('b')
+        self.sentiments = array('h') # len(Sentiment.__slots__) per phrase
+
+        for phrase in dialog:
+            self.append(phrase)
+
+    @staticmethod
+    def intern(names, name):
+        if name not in names:
+            names.append(name)
+        return names.index(name)
+
+    def append(self, phrase):
+        self.phrases.append(phrase.phrase)
+        self.actors.append(self.intern(self.actor_names, phrase.actor))
+        self.directions.append(self.intern(self.direction_names, phrase.direction))
+        self.phrase_types.append(phrase.phrase_type)
+        self.interrupted.append(phrase.interrupted)
+        self.sentiments.extend(getattr(phrase.sentiment, field) for field in Sentiment.__slots__)
+
+    def sentiment(self, index):
+        fields = len(Sentiment.__slots__)
+        sentiment = Sentiment()
+        for field, score in zip(Sentiment.__slots__, self.sentiments[index * fields:(index + 1) * fields]):
+            setattr(sentiment, field, score)
+        return sentiment
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError("dialog index out of range")
+        return DialogueRow(self, index % len(self))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield DialogueRow(self, index)
+
+
+class DialogueRow(object):
+    """ one phrase of a Dialog, read from its columns when asked for """
+    __slots__ = ('dialog', 'index')
+
+    def __init__(self, dialog, index):
+        self.dialog = dialog
+        self.index = index
+
+    @property
+    def phrase(self):
+        return self.dialog.phrases[self.index]
+
+    @property
+    def actor(self):
+        return self.dialog.actor_names[self.dialog.actors[self.index]]
+
+    @property
+    def direction(self):
+        return self.dialog.direction_names[self.dialog.directions[self.index]]
+
+    @property
+    def phrase_type(self):
+        return self.dialog.phrase_types[self.index]
+
+    @property
+    def interrupted(self):
+        return bool(self.dialog.interrupted[self.index])
+
+    @property
+    def sentiment(self):
+        return self.dialog.sentiment(self.index)
+
+
 class Chapter(object):
     def __init__(self, phrases, title, word_count):
-        self.dialog = phrases
+        self.dialog = Dialog(phrases)
         self.title = title
         self.word_count = word_count
 
     @staticmethod
     def create_from_corpus_file(filename):
-        with open(filename, 'r') as docs:
+        with contextlib.closing(corpusfile.read_documents([filename])) as docs:
             gen = ChapterGenerator.generate_from_documents(docs)
             title = gen.generate_title()
             return Chapter(gen.phrases, title, gen.word_count)
 
 
 if __name__ == '__main__':
-    gen = ChapterGenerator.generate_from_documents(fileinput.input())
+    gen = ChapterGenerator.generate_from_documents(corpusfile.read_documents(sys.argv[1:]))
 
     for p in gen.phrases:
         print("{}{}: {}".format(p.actor, p.direction, p.phrase))
+
+    for name, corpus in (("teacher", gen.teacher), ("student", gen.student)):
+        print("{} relearned {} of {} sentences ({:.0%})".format(
+            name, corpus.dedup_hits, corpus.dedup_lookups, corpus.dedup_hit_rate()), file=sys.stderr)
+        print("{} sentence seconds: {}".format(name, corpus.sentence_seconds), file=sys.stderr)
+        print("{} sentence lengths: {}".format(name, corpus.sentence_lengths), file=sys.stderr)
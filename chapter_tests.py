@@ -0,0 +1,49 @@
+import chapter, phrases
+
+import pickle
+from nose.tools import *
+
+
+def make_dialog():
+    dialog = []
+    for text, actor, interrupted in (("Is it true?", "SOCRATES", False),
+                                     ("It is true", "ARISTOTLE", True),
+                                     ("It is true", "SOCRATES", False)):
+        sentence = phrases.GeneratedSentence(text, 3, interrupted)
+        dialog.append(chapter.DialoguePhrase(sentence, phrases.FACT, actor))
+    chapter.Sentiment.update_dialog_scores(dialog)
+    dialog[1].direction = " (agreeing)"
+    return dialog
+
+
+def test_dialog_keeps_phrases():
+    dialog = make_dialog()
+    columns = chapter.Dialog(dialog)
+
+    eq_(len(columns), 3)
+    for original, row in zip(dialog, columns):
+        eq_(row.phrase, original.phrase)
+        eq_(row.actor, original.actor)
+        eq_(row.direction, original.direction)
+        eq_(row.phrase_type, original.phrase_type)
+        eq_(row.interrupted, original.interrupted)
+        eq_(row.sentiment.dist(original.sentiment), 0)
+
+    eq_(columns[-1].actor, "SOCRATES")
+    eq_(columns[2].sentiment.interrupting, 1)
+    eq_(columns.actor_names, ["SOCRATES", "ARISTOTLE"])
+
+
+def test_dialog_groups_like_a_list():
+    from novel import groupconsecutive
+
+    dialog = make_dialog()
+    grouped = [(key, [p.phrase for p in group]) for key, group in groupconsecutive(dialog, 'actor', 'direction')]
+    columns = chapter.Dialog(dialog)
+    eq_([(key, [p.phrase for p in group]) for key, group in groupconsecutive(columns, 'actor', 'direction')], grouped)
+
+
+def test_chapter_pickles():
+    book = chapter.Chapter(make_dialog(), "A title?", 9)
+    loaded = pickle.loads(pickle.dumps(book))
+    eq_([p.phrase for p in loaded.dialog], [p.phrase for p in book.dialog])
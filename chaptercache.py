@@ -0,0 +1,41 @@
+import gzip, hashlib, os, pickle
+
+# bump this whenever Chapter changes in a way older pickles cannot be loaded into
+CACHE_VERSION = 2
+
+
+def file_fingerprint(filename, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ChapterCache(object):
+    """ Keeps finished chapters on disk, keyed by the corpus they were generated
+    from, the seed of the run and their index in the novel. A run that is stopped
+    can then pick up after the last chapter it finished. """
+
+    def __init__(self, directory, corpus_filename, seed):
+        self.directory = os.path.join(directory, "v{}".format(CACHE_VERSION),
+                                      "{}-{}".format(file_fingerprint(corpus_filename), seed))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, index):
+        return os.path.join(self.directory, "chapter-{}.pickle.gz".format(index))
+
+    def load(self, index):
+        """ returns the chapter stored for index, or None """
+        try:
+            with gzip.open(self.path(index), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def store(self, index, chapter):
+        # write to a temporary file first so a killed run never leaves half a chapter
+        partial = self.path(index) + ".partial"
+        with gzip.open(partial, 'wb') as f:
+            pickle.dump(chapter, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(partial, self.path(index))
@@ -0,0 +1,46 @@
+import chapter, chaptercache, phrases
+
+import os, tempfile
+from nose.tools import *
+
+
+def make_chapter():
+    sentence = phrases.GeneratedSentence("Hey it works!", 3, False)
+    dialog = [chapter.DialoguePhrase(sentence, phrases.FACT, "SOCRATES")]
+    return chapter.Chapter(dialog, "Does it work?", 3)
+
+
+def test_store_and_load():
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus.txt")
+        with open(corpus, 'w') as f:
+            f.write("a philosophical document\n")
+
+        cache = chaptercache.ChapterCache(directory, corpus, 42)
+        eq_(cache.load(0), None)
+
+        cache.store(0, make_chapter())
+        loaded = chaptercache.ChapterCache(directory, corpus, 42).load(0)
+        eq_(loaded.title, "Does it work?")
+        eq_(loaded.word_count, 3)
+        eq_(loaded.dialog[0].phrase, "Hey it works!")
+
+        eq_(chaptercache.ChapterCache(directory, corpus, 43).load(0), None)
+
+
+def test_fingerprint_changes_with_corpus():
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus.txt")
+        with open(corpus, 'w') as f:
+            f.write("a philosophical document\n")
+        before = chaptercache.file_fingerprint(corpus)
+
+        with open(corpus, 'a') as f:
+            f.write("another philosophical document\n")
+        ok_(chaptercache.file_fingerprint(corpus) != before)
+
+
+@raises(ValueError)
+def test_unseeded_runs_are_not_cached():
+    import novel
+    novel.Novel.create_from_corpus_file("corpus.txt", seed=None, cache_dir=tempfile.gettempdir())
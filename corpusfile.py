@@ -0,0 +1,72 @@
+import bz2, gzip, io, lzma, queue, sys, threading
+
+# compressed corpora are recognised by their extension
+OPENERS = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+
+READ_SIZE = 1 << 20 # bytes read from the file at a time
+BATCH_SIZE = 1 << 18 # characters of lines handed over at a time
+QUEUE_SIZE = 16 # batches decoded ahead of the reader
+
+DONE = object()
+
+
+def open_binary(filename):
+    """ opens filename for reading bytes, decompressing it if need be. "-" is stdin """
+    if filename == "-":
+        return sys.stdin.buffer
+    for extension, opener in OPENERS.items():
+        if filename.endswith(extension):
+            return opener(filename, 'rb')
+    return open(filename, 'rb', buffering=READ_SIZE)
+
+
+def read_into(filenames, batches, stop, encoding, errors):
+    try:
+        for filename in filenames:
+            with io.TextIOWrapper(open_binary(filename), encoding=encoding, errors=errors) as text:
+                while not stop.is_set():
+                    lines = text.readlines(BATCH_SIZE)
+                    if not lines:
+                        break
+                    put_batch(batches, lines, stop)
+    except BaseException as e:
+        put_batch(batches, e, stop)
+    put_batch(batches, DONE, stop)
+
+
+def put_batch(batches, item, stop):
+    while not stop.is_set():
+        try:
+            batches.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+def read_documents(filenames, encoding='utf-8', errors='strict'):
+    """ yields the lines of each file in filenames, like fileinput.input(). Files
+    ending in .gz, .bz2 or .xz are decompressed. Reading, decompressing and
+    decoding happen in a background thread, a bounded number of batches ahead,
+    so they overlap with whatever is done with the lines. """
+    filenames = list(filenames) or ["-"]
+    batches = queue.Queue(QUEUE_SIZE)
+    stop = threading.Event()
+    reader = threading.Thread(target=read_into, args=(filenames, batches, stop, encoding, errors), daemon=True)
+    reader.start()
+
+    try:
+        while True:
+            batch = batches.get()
+            if batch is DONE:
+                break
+            if isinstance(batch, BaseException):
+                raise batch
+            yield from batch
+    finally:
+        # also reached when we are closed before the end, so the reader can quit
+        stop.set()
+        reader.join()
@@ -0,0 +1,43 @@
+import corpusfile
+
+import bz2, gzip, lzma, os, tempfile
+from nose.tools import *
+
+LINES = ["the first document\n", "a second document, café\n", "the last one\n"]
+
+
+def write_corpus(directory, extension, opener):
+    filename = os.path.join(directory, "corpus.txt" + extension)
+    with opener(filename, 'wt', encoding='utf-8') as f:
+        f.writelines(LINES)
+    return filename
+
+
+def test_reads_compressed_corpora():
+    with tempfile.TemporaryDirectory() as directory:
+        for extension, opener in (("", open), (".gz", gzip.open), (".bz2", bz2.open), (".xz", lzma.open)):
+            filename = write_corpus(directory, extension, opener)
+            eq_(list(corpusfile.read_documents([filename])), LINES)
+
+
+def test_reads_many_files():
+    with tempfile.TemporaryDirectory() as directory:
+        plain = write_corpus(directory, "", open)
+        packed = write_corpus(directory, ".gz", gzip.open)
+        eq_(list(corpusfile.read_documents([plain, packed])), LINES + LINES)
+
+
+def test_stops_reading_when_closed():
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "corpus.txt.gz")
+        with gzip.open(filename, 'wt') as f:
+            f.writelines("document number {}\n".format(i) for i in range(200000))
+
+        docs = corpusfile.read_documents([filename])
+        eq_(next(docs), "document number 0\n")
+        docs.close()
+
+
+@raises(FileNotFoundError)
+def test_raises_reader_errors():
+    list(corpusfile.read_documents(["/no/such/corpus.txt.xz"]))
@@ -0,0 +1,39 @@
+import bisect
+
+
+class Histogram(object):
+    """ Counts values in buckets whose upper bounds grow by a constant factor, so
+    that a few dozen buckets cover values from tiny to huge. Percentiles are only
+    as precise as the buckets, and are reported as a bucket's upper bound. """
+
+    def __init__(self, smallest, factor=2, buckets=32):
+        self.bounds = [smallest * factor ** i for i in range(buckets)]
+        self.counts = [0] * (buckets + 1) # the last bucket is for anything bigger
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def percentile(self, p):
+        """ an upper bound for the p-th percentile, 0 <= p <= 100 """
+        if self.count == 0:
+            return 0
+        wanted = p / 100.0 * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= wanted:
+                return min(bound, self.max)
+        return self.max
+
+    def __str__(self):
+        return "n={} mean={:.4g} p50<={:.4g} p90<={:.4g} p99<={:.4g} max={:.4g}".format(
+            self.count, self.mean(), self.percentile(50), self.percentile(90), self.percentile(99), self.max)
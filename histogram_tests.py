@@ -0,0 +1,28 @@
+import histogram
+
+from nose.tools import *
+
+
+def test_percentiles():
+    h = histogram.Histogram(1)
+    for value in range(1, 101):
+        h.record(value)
+
+    eq_(h.count, 100)
+    eq_(h.mean(), 50.5)
+    eq_(h.percentile(50), 64) # 50 falls in the (32, 64] bucket
+    eq_(h.percentile(100), 100)
+    eq_(h.max, 100)
+
+
+def test_overflow_bucket():
+    h = histogram.Histogram(1, buckets=4)
+    h.record(1000)
+    eq_(h.counts[-1], 1)
+    eq_(h.percentile(99), 1000)
+
+
+def test_empty():
+    h = histogram.Histogram(0.001)
+    eq_(h.percentile(99), 0)
+    eq_(h.mean(), 0)
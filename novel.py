@@ -1,30 +1,100 @@
-import itertools, sys
+import argparse, concurrent.futures, itertools, os, random, sys
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
 from chapter import Chapter
+from chaptercache import ChapterCache
+
+TEMPLATE_CACHE_DIR = "./.template_cache"
+CHAPTER_CACHE_DIR = "./.chapter_cache"
 
 def groupconsecutive(iter_in, *attrs):
     return itertools.groupby(iter_in, key=lambda x: [getattr(x, a) for a in attrs])
 
-templates = Environment(loader=FileSystemLoader("./templates"))
-templates.filters['groupconsecutive'] = groupconsecutive
-novel_template = templates.get_template('novel.html')
+def chapter_filename(chapter_num):
+    return "chapter-{}.html".format(chapter_num)
+
+class TemplateCache(FileSystemBytecodeCache):
+    """ creates its directory when the first template is compiled, rather than
+    when this module is imported """
+
+    def dump_bytecode(self, bucket):
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+def make_templates(cache_dir=TEMPLATE_CACHE_DIR):
+    """ compiled templates are cached in cache_dir, so repeated runs (and each
+    worker process) skip compiling them again """
+    env = Environment(loader=FileSystemLoader("./templates"),
+                      bytecode_cache=TemplateCache(cache_dir))
+    env.filters['groupconsecutive'] = groupconsecutive
+    env.globals['chapter_filename'] = chapter_filename
+    return env
+
+templates = make_templates()
+
+def write_page(path, template_name, **context):
+    with open(path, 'w') as out:
+        out.write(templates.get_template(template_name).render(**context))
+    return path
+
+def write_chapter_page(directory, novel_title, chapter_count, chapter_num, chapter):
+    return write_page(os.path.join(directory, chapter_filename(chapter_num)), 'chapter_page.html',
+                      novel_title=novel_title, chapter_count=chapter_count,
+                      chapter_num=chapter_num, chapter=chapter)
 
 class Novel(object):
     def __init__(self, chapters, title="Socrates and Aristotle are Fighting Again"):
         self.chapters = chapters
         self.title = title
 
+    def render(self):
+        """ the whole novel as a single page """
+        return templates.get_template('novel.html').render(novel=self)
+
+    def write_pages(self, directory, workers=None):
+        """ writes an index page and one page per chapter into directory, rendering
+        chapters in a pool of worker processes. Returns the written paths. """
+        os.makedirs(directory, exist_ok=True)
+        # compile every template (including the extended and included ones) before
+        # forking, so workers inherit them and the cache is only written once
+        for name in ('layout.html', 'chapter.html', 'chapter_page.html', 'index.html'):
+            templates.get_template(name)
+
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            jobs = [pool.submit(write_chapter_page, directory, self.title, len(self.chapters), num, chapter)
+                    for num, chapter in enumerate(self.chapters, 1)]
+            index = write_page(os.path.join(directory, 'index.html'), 'index.html', novel=self)
+            return [index] + [job.result() for job in jobs]
+
     @staticmethod
-    def create_from_corpus_file(filename, min_words=500):
+    def create_from_corpus_file(filename, min_words=500, seed=None, cache_dir=None):
+        """ when cache_dir is given, each finished chapter is saved there and
+        chapters already saved by an earlier run with the same corpus and seed
+        are reused instead of being generated again. Caching needs a seed, as
+        unseeded runs have nothing to resume. """
+        if cache_dir and seed is None:
+            raise ValueError("chapters can only be cached for a seeded run")
+
         words = 0
         chapters = []
+        cache = ChapterCache(cache_dir, filename, seed) if cache_dir else None
 
         while words < min_words:
-            chapter = Chapter.create_from_corpus_file(filename)
+            index = len(chapters)
+            chapter = cache and cache.load(index)
+            if chapter:
+                print("loaded chapter with {} words".format(chapter.word_count), file=sys.stderr)
+            else:
+                if seed is not None:
+                    # seed each chapter on its own, so that resuming a run gives the same chapters
+                    random.seed("{}-{}".format(seed, index))
+                chapter = Chapter.create_from_corpus_file(filename)
+                print("generated chapter with {} words".format(chapter.word_count), file=sys.stderr)
+                if cache:
+                    cache.store(index, chapter)
+
             words += chapter.word_count
-            print("generated chapter with {} words".format(chapter.word_count), file=sys.stderr)
             chapters.append(chapter)
 
         print("generated novel with {} chapters, {} words".format(len(chapters), words), file=sys.stderr)
@@ -32,7 +102,27 @@ class Novel(object):
 
 
 if __name__ == '__main__':
-    corpus_filename = sys.argv[1]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus")
+    parser.add_argument("output_directory", nargs='?',
+                        help="write one page per chapter here, instead of printing the whole novel")
+    parser.add_argument("--seed", type=int,
+                        help="seed for a repeatable novel; pass the seed of a stopped run to resume it")
+    parser.add_argument("--min-words", type=int, default=50000)
+    parser.add_argument("--cache-dir", default=CHAPTER_CACHE_DIR,
+                        help="where finished chapters of seeded runs are kept so a stopped run can resume")
+    parser.add_argument("--no-cache", action='store_const', const=None, dest='cache_dir')
+    args = parser.parse_args()
+
+    if args.cache_dir and args.seed is None:
+        # every run is a new novel, but it still gets a seed it can be resumed with
+        args.seed = random.randrange(1 << 32)
+        print("generating with --seed {}".format(args.seed), file=sys.stderr)
 
-    novel = Novel.create_from_corpus_file(corpus_filename, min_words=50000)
-    print(novel_template.render(novel=novel))
+    novel = Novel.create_from_corpus_file(args.corpus, min_words=args.min_words,
+                                          seed=args.seed, cache_dir=args.cache_dir)
+    if args.output_directory:
+        for path in novel.write_pages(args.output_directory):
+            print("wrote {}".format(path), file=sys.stderr)
+    else:
+        print(novel.render())
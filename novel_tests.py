@@ -0,0 +1,43 @@
+import chapter, novel, phrases
+
+import os, re, tempfile
+from nose.tools import *
+
+
+def make_chapter(title, lines):
+    dialog = [chapter.DialoguePhrase(phrases.GeneratedSentence(line, 2, False), phrases.FACT, actor)
+              for actor, line in lines]
+    return chapter.Chapter(dialog, title, 2 * len(lines))
+
+
+def sections(html):
+    return [" ".join(section.split()) for section in re.findall(r'<section.*?</section>', html, re.S)]
+
+
+def test_pages_match_single_file():
+    book = novel.Novel([
+        make_chapter("Who is wise?", [("SOCRATES", "Not I."), ("SOCRATES", "Nor you."), ("ARISTOTLE", "Hmm.")]),
+        make_chapter("What is good?", [("ARISTOTLE", "Virtue is.")]),
+    ])
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = book.write_pages(directory, workers=2)
+        eq_([os.path.basename(path) for path in paths], ["index.html", "chapter-1.html", "chapter-2.html"])
+
+        pages = []
+        for path in paths[1:]:
+            with open(path) as f:
+                pages.extend(sections(f.read()))
+
+    eq_(len(pages), 2)
+    eq_(pages, sections(book.render()))
+
+
+def test_template_cache_is_made_on_first_compile():
+    with tempfile.TemporaryDirectory() as directory:
+        cache_dir = os.path.join(directory, "cache")
+        templates = novel.make_templates(cache_dir)
+        ok_(not os.path.exists(cache_dir))
+
+        templates.get_template('index.html')
+        ok_(os.listdir(cache_dir))
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 
 from collections import defaultdict
-import fileinput, itertools, math, nltk, random, re
+import itertools, math, nltk, random, re, sys, time
 
+import corpusfile
 from cleaners import Cleaner
+from histogram import Histogram
+from sharedgrams import weighted_pick
+from suffixarray import TokenIndex
 from conversation import *
 
 sentence_splitter = nltk.data.load('tokenizers/punkt/english.pickle')
@@ -18,6 +22,18 @@ QUESTION = 0
 DECLARATION = 1
 FACT = 2
 
+# returned by GramNode.walk callbacks to skip a node's children, or stop walking
+SKIP = object()
+STOP = object()
+
+# what Corpus.add_document does with a sentence it has already learned
+DEDUP_OFF = 0 # tokenize and learn it again, as if it were new
+DEDUP_BUMP = 1 # count it again on the nodes it reached last time, without tokenizing it
+DEDUP_SKIP = 2 # don't learn it again
+
+# generated sentences are interrupted after this many tokens by default
+MAX_SENTENCE_TOKENS = 100
+
 FACT_WORDS = set(["hence", "therefore", "is", "can", "proven", "cannot", "must", "should"])
 
 def lower(token):
@@ -41,35 +57,77 @@ class GramNode(object):
 
     def likelihood(self, phrase_type):
         # take log of occurrences + 1 so that 0 occurrences = 0, and very common phrases
-        # do not completely dominate our phrases
-        return sum(map(lambda x: x.likelihood(phrase_type), self.children.values())) + math.log(self.occurrences[phrase_type] + 1)
+        # do not completely dominate our phrases. A node's likelihood includes that of
+        # all of its children, so this is the sum over the whole subtree.
+        log = math.log
+        return sum([log(node.occurrences.get(phrase_type, 0) + 1) for node in self.nodes()])
+
+    def nodes(self):
+        """ yields this node and every node below it, one level at a time. Changes
+        made to a node's children before the next level starts are respected. """
+        level = [self]
+        while level:
+            yield from level
+            level = [child for node in level for child in node.children.values()]
+
+    def walk(self, enter=None, leave=None, context=None):
+        """ Visits this node and every node below it, using a stack instead of
+        recursion. enter(key, node, context) is called before a node's children
+        and leave(key, node, context) after them, where key is None for this node.
+
+        Each node's context is what enter returned for its parent, starting with
+        the context passed in here. enter may return SKIP to leave out a node's
+        children, and either callback may return STOP to end the walk early.
+        Returns False if the walk was stopped, True otherwise. """
+        stack = [(None, self, context, False)]
+        while stack:
+            key, node, context, done = stack.pop()
+            if done:
+                if leave(key, node, context) is STOP:
+                    return False
+                continue
+
+            child_context = enter(key, node, context) if enter else context
+            if child_context is STOP:
+                return False
+            if leave:
+                stack.append((key, node, context, True))
+            if child_context is SKIP:
+                continue
+            # reversed, so that children are visited in order
+            stack.extend([(k, child, child_context, False) for k, child in reversed(node.children.items())])
+        return True
 
     def get(self, keys):
-        if len(keys) == 0:
-            return self
-        return self.children[keys[0]].get(keys[1:])
+        node = self
+        for key in keys:
+            node = node.children[key]
+        return node
 
     def delete(self, key):
-        if key in self.children:
-            del self.children[key]
-        for child in self.children.values():
-            child.delete(key)
+        for node in self.nodes():
+            node.children.pop(key, None)
 
     def pick(self, phrase_type):
-        skip = random.random() * (self.likelihood(phrase_type) - math.log(self.occurrences[phrase_type] + 1))
-        for token in self.children:
-            skip -= self.children[token].likelihood(phrase_type)
+        # the children's likelihoods add up to ours, less our own occurrences
+        likelihoods = [(token, child, child.likelihood(phrase_type)) for token, child in self.children.items()]
+        skip = random.random() * sum(likelihood for token, child, likelihood in likelihoods)
+        for token, child, likelihood in likelihoods:
+            skip -= likelihood
             if skip <= 0:
-                return token, self.children[token]
+                return token, child
 
         return random.choice(list(self.children.items()) or [(EARLY_END[0], None)])
 
     def has(self, keys):
         if len(keys) == 0:
             return False
-        elif len(keys) == 1:
-            return keys[0] in self.children
-        return keys[0] in self.children and self.children[keys[0]].has(keys[1:])
+        node = self
+        for key in keys:
+            if key not in node.children:
+                return False
+            node = node.children[key]
+        return True
 
     def pick_best(self, keys, phrase_type):
         oldKeys = keys
@@ -79,20 +137,24 @@ class GramNode(object):
         return result
 
     def merge_into(self, other, weight=1.0):
-        for phrase_type, count in self.occurrences.items():
-            other.occurrences[phrase_type ]+= count * weight
-        for key in self.children:
-            self.children[key].merge_into(other.children[key], weight)
+        def merge(key, node, other_parent):
+            # the context is the node in other matching this node's parent
+            target = other if key is None else other_parent.children[key]
+            for phrase_type, count in node.occurrences.items():
+                target.occurrences[phrase_type] += count * weight
+            return target
+        self.walk(merge, context=other)
 
     def traverse(self, f):
-        for child in self.children.values():
-            child.traverse(f)
-        f(self)
+        self.walk(leave=lambda key, node, context: f(node))
 
     def show(self, spaces):
-        for token, node in self.children.items():
-            print("{}-> {}".format(spaces, token))
-            node.show(spaces + "-")
+        def show_node(key, node, spaces):
+            if key is None:
+                return spaces
+            print("{}-> {}".format(spaces, key))
+            return spaces + "-"
+        self.walk(show_node, context=spaces)
 
 
 PRE_PUNCT_SPACE_MATCHER = re.compile(r"\s+([.,:)}'?!]+)")
@@ -126,11 +188,26 @@ class GeneratedSentence(object):
         return self.detokenized
 
 class Corpus(object):
-    def __init__(self, gram_length=5):
+    def __init__(self, gram_length=5, dedup=DEDUP_BUMP, max_tokens=MAX_SENTENCE_TOKENS, max_seconds=None):
         self.counts = GramNode(None)
         self.gram_length = gram_length
         self.cleaner = Cleaner()
 
+        # generated sentences are cut short (interrupted) when they go over either
+        # budget. Time budgets make generation depend on the machine, so no time
+        # budget is set unless asked for.
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.sentence_seconds = Histogram(0.0001)
+        self.sentence_lengths = Histogram(1)
+
+        self.dedup = dedup
+        # sentence fingerprint -> what add_sentence returned for it, or None. For a
+        # GramNode tree that is the leaf of each of its grams, not a copy of its text
+        self.learned = {}
+        self.dedup_lookups = 0
+        self.dedup_hits = 0
+
     @staticmethod
     def tokenize_sentence(sentence):
         return BEGIN + nltk.word_tokenize(sentence) + END
@@ -147,23 +224,52 @@ class Corpus(object):
         sentences = self.cleaner.clean_sentences(sentence_splitter.tokenize(doc))
 
         for s in sentences:
+            if self.dedup != DEDUP_OFF:
+                # hash collisions are rare enough not to matter for what we generate
+                fingerprint = hash(s)
+                self.dedup_lookups += 1
+                if fingerprint in self.learned:
+                    self.dedup_hits += 1
+                    learned = self.learned[fingerprint]
+                    if self.dedup == DEDUP_BUMP and learned:
+                        self.bump(learned)
+                    continue
+
             tokens = self.cleaner.clean_phrase(self.tokenize_sentence(s))
+            if len(tokens) <= 2: # nothing left between BEGIN and END
+                tokens = None
 
-            if len(tokens) < 2:
-                continue
-            self.add_sentence(tokens)
+            learned = self.add_sentence(tokens) if tokens else None
+            if self.dedup != DEDUP_OFF:
+                self.learned[fingerprint] = learned if self.dedup == DEDUP_BUMP else None
+
+    def dedup_hit_rate(self):
+        """ the fraction of sentences added with add_document that were learned before """
+        return self.dedup_hits / self.dedup_lookups if self.dedup_lookups else 0.0
 
     def add_sentence(self, tokens, phrase_type=None):
+        """ returns what bump() needs to count this sentence again """
         if type(tokens) is str:
             tokens = self.tokenize_sentence(tokens)
         phrase_type = phrase_type or self.deduce_phrase_type(tokens)
 
+        leaves = []
         grams = list(nltk.ngrams(tokens, self.gram_length, pad_right=True, pad_symbol=None))
         for g in grams:
             if None in g:
                 g = g[:g.index(None)]
                 # we don't need the padding!
-            self.counts.get(g).add_occurrence(phrase_type)
+            leaf = self.counts.get(g)
+            leaf.add_occurrence(phrase_type)
+            leaves.append(leaf)
+        return leaves, phrase_type
+
+    def bump(self, learned):
+        # nodes removed by delete() or fix_casing() since then are no longer in
+        # the tree, so counting them again has no effect
+        leaves, phrase_type = learned
+        for leaf in leaves:
+            leaf.add_occurrence(phrase_type)
 
     def add_sentences(self, sentences, phrase_type=None):
         for s in sentences:
@@ -183,14 +289,29 @@ class Corpus(object):
         return self.counts.pick_best(previous, phrase_type)
 
     def generate_sentence(self, phrase_type, citation_name="Socrates"):
+        started = time.perf_counter()
         words = BEGIN + BEGIN
         while words[-1] != END[0] and words[-1] != EARLY_END[0]:
+            if self.over_budget(len(words) - 2, started):
+                words.append(EARLY_END[0])
+                break
             # choose number of previous tokens to consider, trending towards more as our sentence grows
             context = self.gram_length - 1 - math.floor(random.random() ** math.log(len(words)) * (self.gram_length - 1))
             token, node = self.pick_next_token(words[-context:], phrase_type)
             words.append(token)
         words = self.replace_citation_special(words, citation_name)
-        return GeneratedSentence.for_tokens(words[1:])
+        sentence = GeneratedSentence.for_tokens(words[1:])
+
+        self.sentence_seconds.record(time.perf_counter() - started)
+        self.sentence_lengths.record(sentence.length)
+        return sentence
+
+    def over_budget(self, generated, started):
+        if generated == 0: # always let a sentence have at least one token
+            return False
+        if self.max_tokens is not None and generated >= self.max_tokens:
+            return True
+        return self.max_seconds is not None and time.perf_counter() - started >= self.max_seconds
 
     def replace_citation_special(self, phrase, name):
         year = random.randrange(1600, 2016)
@@ -201,11 +322,10 @@ class Corpus(object):
 
     def word_set(self, node=None):
         node = node or self.counts
-        all_words = set(node.children.keys()) - {BEGIN[0], END[0]} # strings only
-
-        for child in node.children.values():
-            all_words.update(self.word_set(child))
-        return all_words
+        all_words = set()
+        for n in node.nodes():
+            all_words.update(n.children)
+        return all_words - {BEGIN[0], END[0]} # strings only
 
     def fix_casing(self):
         all_words = self.word_set()
@@ -215,27 +335,78 @@ class Corpus(object):
         self.to_lower(self.counts, no_lower)
 
     def to_lower(self, node, exempt):
-        for child in node.children.values():
-            self.to_lower(child, exempt)
+        # deepest levels first, so that children are lowered before they are merged
+        for n in reversed(list(node.nodes())):
+            # make a list so that we don't get tripped up while deleting/adding keys
+            for key in list(n.children.keys()):
+                low_key = lower(key)
+                if low_key in exempt or low_key == key:
+                    continue
 
-        # make a list so that we don't get tripped up while deleting/adding keys
-        for key in list(node.children.keys()):
-            low_key = lower(key)
-            if low_key in exempt or low_key == key:
-                continue
-
-            node.children[key].merge_into(node.children[low_key])
-            del node.children[key]
+                n.children[key].merge_into(n.children[low_key])
+                del n.children[key]
 
     def show(self):
         self.counts.show("")
 
 
+class SharedCorpus(Corpus):
+    """ A Corpus that samples from a read-only FrozenGrams model, which may be shared
+    with other processes. Everything added to this corpus goes into its own private
+    GramNode tree, and is sampled together with the frozen model. """
+
+    def __init__(self, frozen, gram_length=5, **kwargs):
+        super().__init__(gram_length, **kwargs)
+        self.frozen = frozen
+
+    def pick_next_token(self, previous, phrase_type):
+        keys = previous
+        while not (self.frozen.has(keys) or self.counts.has(keys)) and len(keys) > 0:
+            keys = keys[1:]
+
+        likelihoods = defaultdict(lambda : 0)
+        for token, likelihood in self.frozen.choices(keys, phrase_type):
+            likelihoods[token] += likelihood
+        if len(keys) == 0 or self.counts.has(keys):
+            for token, child in self.counts.get(keys).children.items():
+                likelihoods[token] += child.likelihood(phrase_type)
+
+        return weighted_pick(list(likelihoods.items()), EARLY_END[0]), None
+
+
+class SuffixCorpus(Corpus):
+    """ A Corpus backed by a TokenIndex instead of a GramNode tree. Every sentence is
+    kept whole, so gram_length only limits how much context generation asks for,
+    and can be as long as we like without costing memory. """
+
+    def __init__(self, gram_length=5, counts=None, **kwargs):
+        super().__init__(gram_length, **kwargs)
+        self.counts = counts or TokenIndex(EARLY_END[0])
+
+    def add_sentence(self, tokens, phrase_type=None):
+        if type(tokens) is str:
+            tokens = self.tokenize_sentence(tokens)
+        phrase_type = phrase_type or self.deduce_phrase_type(tokens)
+        self.counts.add(tokens, phrase_type)
+        return tokens, phrase_type
+
+    def bump(self, learned):
+        # the index only counts a sentence by holding it again, so unlike the
+        # tree, DEDUP_BUMP keeps a copy of the tokens of every sentence learned
+        self.add_sentence(*learned)
+
+    def word_set(self, node=None):
+        return self.counts.word_set() - {BEGIN[0], END[0], EARLY_END[0]}
+
+    def to_lower(self, node, exempt):
+        node.to_lower(exempt, lower)
+
+
 if __name__ == '__main__':
     corpus = Corpus()
     add_all_conversation(corpus)
 
-    for l in fileinput.input():
+    for l in corpusfile.read_documents(sys.argv[1:]):
         corpus.add_document(l)
 
     corpus.counts.delete("\\")
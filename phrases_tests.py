@@ -62,3 +62,93 @@ def test_splits_sentences_on_tabs():
 
     ok_(corpus.counts.has("this is a".split()))
     ok_(not corpus.counts.has("thing and this".split()))
+
+def test_walk_stops_early():
+    corpus = phrases.Corpus()
+    corpus.add_sentences(["hey it works", "hey it made two sentences"])
+
+    visited = []
+    def enter(key, node, context):
+        visited.append(key)
+        if key == "it":
+            return phrases.STOP
+    ok_(not corpus.counts.walk(enter))
+    ok_("it" in visited)
+    ok_("two" not in visited)
+
+    def skip_hey(key, node, context):
+        if key == "hey":
+            return phrases.SKIP
+    visited = []
+    ok_(corpus.counts.walk(skip_hey, leave=lambda key, node, context: visited.append(key)))
+    ok_("hey" in visited)
+    eq_(visited.count("it"), 1) # only the top level "it", not the one after "hey"
+
+def test_deep_tree():
+    root = phrases.GramNode(None)
+    root.get(["w{}".format(i) for i in range(5000)]).add_occurrence(phrases.FACT)
+
+    eq_(len(phrases.Corpus().word_set(root)), 5000)
+    ok_(root.likelihood(phrases.FACT) > 0)
+
+    copy = phrases.GramNode(None)
+    root.merge_into(copy)
+    ok_(copy.has(["w0", "w1"]))
+
+def test_skips_empty_sentences():
+    corpus = phrases.Corpus()
+    # the leading number cleaner removes the only token, "."
+    corpus.add_document("this is a thing. .")
+
+    ok_(not corpus.counts.has([phrases.BEGIN[0], phrases.END[0]]))
+
+def test_dedup_bump_learns_like_new():
+    documents = ["hey it works. it made two sentences.", "hey it works.", "hey it works."]
+    bumped = phrases.Corpus(dedup=phrases.DEDUP_BUMP)
+    relearned = phrases.Corpus(dedup=phrases.DEDUP_OFF)
+    for doc in documents:
+        bumped.add_document(doc)
+        relearned.add_document(doc)
+
+    for keys in (["hey", "it", "works", ".", phrases.END[0]], ["two", "sentences", ".", phrases.END[0]]):
+        eq_(bumped.counts.get(keys).occurrences, relearned.counts.get(keys).occurrences)
+    eq_(bumped.dedup_hits, 2)
+    eq_(bumped.dedup_hit_rate(), 0.5)
+    eq_(relearned.dedup_hit_rate(), 0.0)
+
+def test_dedup_bump_keeps_nodes_not_text():
+    corpus = phrases.Corpus(dedup=phrases.DEDUP_BUMP)
+    corpus.add_document("hey it works.")
+    corpus.add_document("hey it works.")
+
+    leaves, phrase_type = list(corpus.learned.values())[0]
+    eq_(phrase_type, phrases.DECLARATION)
+    ok_(all(isinstance(leaf, phrases.GramNode) for leaf in leaves))
+    eq_(corpus.counts.get(["hey", "it", "works", ".", phrases.END[0]]).occurrences[phrases.DECLARATION], 2)
+
+def test_dedup_skip():
+    corpus = phrases.Corpus(dedup=phrases.DEDUP_SKIP)
+    corpus.add_document("hey it works.")
+    corpus.add_document("hey it works.")
+
+    eq_(corpus.counts.get(["hey", "it", "works", ".", phrases.END[0]]).occurrences[phrases.DECLARATION], 1)
+    eq_(corpus.dedup_hits, 1)
+
+def test_token_budget_interrupts():
+    corpus = phrases.Corpus(max_tokens=10)
+    # "a" is only ever followed by "a", so this never ends by itself
+    corpus.add_sentence(phrases.BEGIN + ["a"] * 8, phrases.FACT)
+
+    generated = corpus.generate_sentence(phrases.FACT)
+    eq_(generated.length, 10)
+    eq_(generated.interrupted, True)
+    eq_(corpus.sentence_lengths.count, 1)
+    eq_(corpus.sentence_lengths.max, 10)
+
+def test_time_budget_interrupts():
+    corpus = phrases.Corpus(max_tokens=None, max_seconds=0.01)
+    corpus.add_sentence(phrases.BEGIN + ["a"] * 8, phrases.FACT)
+
+    generated = corpus.generate_sentence(phrases.FACT)
+    eq_(generated.interrupted, True)
+    ok_(generated.length > 0)
@@ -0,0 +1,193 @@
+import json, mmap, random, struct, sys
+
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+NUM_PHRASE_TYPES = 3
+
+HEADER = struct.Struct("<8sqqq")
+MAGIC = b"GRAMS001"
+
+
+def aligned(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def weighted_pick(choices, fallback):
+    """ choices are (token, likelihood) pairs. Picks a token with probability
+    proportional to its likelihood, the same way GramNode.pick does """
+    total = sum(likelihood for token, likelihood in choices)
+    skip = random.random() * total
+    for token, likelihood in choices:
+        skip -= likelihood
+        if skip <= 0:
+            return token
+    return random.choice([token for token, likelihood in choices] or [fallback])
+
+
+class FrozenGrams(object):
+    """ A read-only copy of a GramNode tree, laid out as flat arrays in one buffer
+    so that it holds no pointers and can be placed in shared memory or a mapped
+    file. Any number of processes can then sample from a single copy.
+
+    Nodes are stored breadth first, with the children of each node next to each
+    other and sorted by token id. Subtree likelihoods are computed once, when the
+    tree is frozen.
+    """
+
+    def __init__(self, buffer, owner=None):
+        # owner is whatever keeps buffer alive, eg. a SharedMemory or mmap
+        self.owner = owner
+        magic, self.size, num_types, vocabulary_length = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("not a frozen gram buffer")
+
+        offset = HEADER.size
+        self.tokens, offset = self.view(buffer, offset, np.int32, (self.size,))
+        self.first_child, offset = self.view(buffer, offset, np.int32, (self.size,))
+        self.child_count, offset = self.view(buffer, offset, np.int32, (self.size,))
+        self.likelihoods, offset = self.view(buffer, offset, np.float64, (self.size, num_types))
+
+        self.vocabulary = json.loads(bytes(buffer[offset:offset + vocabulary_length]).decode('utf-8'))
+        self.ids = {token: i for i, token in enumerate(self.vocabulary)}
+
+    @staticmethod
+    def view(buffer, offset, dtype, shape):
+        offset = aligned(offset)
+        count = int(np.prod(shape))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+        array.flags.writeable = False
+        return array, offset + array.nbytes
+
+    @staticmethod
+    def layout(root):
+        """ flattens the tree under root, returning the arrays and vocabulary to store """
+        vocabulary = []
+        ids = {}
+        nodes = [root]
+        tokens = [-1]
+        first_child = []
+        child_count = []
+
+        for node in nodes: # nodes grows as we go, giving breadth first order
+            for token in node.children:
+                if token not in ids:
+                    ids[token] = len(vocabulary)
+                    vocabulary.append(token)
+            children = sorted(node.children.items(), key=lambda item: ids[item[0]])
+            first_child.append(len(nodes))
+            child_count.append(len(children))
+            for token, child in children:
+                tokens.append(ids[token])
+                nodes.append(child)
+
+        likelihoods = np.zeros((len(nodes), NUM_PHRASE_TYPES))
+        for i in range(len(nodes) - 1, -1, -1): # children come after their parents
+            for phrase_type in range(NUM_PHRASE_TYPES):
+                likelihoods[i, phrase_type] = np.log(nodes[i].occurrences.get(phrase_type, 0) + 1)
+            start = first_child[i]
+            likelihoods[i] += likelihoods[start:start + child_count[i]].sum(axis=0)
+
+        arrays = (np.array(tokens, dtype=np.int32),
+                  np.array(first_child, dtype=np.int32),
+                  np.array(child_count, dtype=np.int32),
+                  likelihoods)
+        return arrays, json.dumps(vocabulary).encode('utf-8')
+
+    @staticmethod
+    def write(root, allocate):
+        """ lays out root into a buffer returned by allocate(size) """
+        arrays, vocabulary = FrozenGrams.layout(root)
+
+        offset = HEADER.size
+        offsets = []
+        for array in arrays:
+            offset = aligned(offset)
+            offsets.append(offset)
+            offset += array.nbytes
+
+        buffer = allocate(offset + len(vocabulary))
+        HEADER.pack_into(buffer, 0, MAGIC, len(arrays[0]), NUM_PHRASE_TYPES, len(vocabulary))
+        for array, at in zip(arrays, offsets):
+            buffer[at:at + array.nbytes] = array.tobytes()
+        buffer[offset:offset + len(vocabulary)] = vocabulary
+        return buffer
+
+    @staticmethod
+    def share(root, name=None):
+        """ freezes root into a new shared memory block. The caller owns the block,
+        and should unlink() it once no process needs it anymore """
+        memory = []
+        def allocate(size):
+            memory.append(shared_memory.SharedMemory(name=name, create=True, size=size))
+            return memory[0].buf
+        FrozenGrams.write(root, allocate)
+        return FrozenGrams(memory[0].buf, memory[0])
+
+    @staticmethod
+    def attach(name):
+        # before python 3.13, attaching also registers the block with this process'
+        # resource tracker, which would unlink it for everyone when we exit
+        if sys.version_info >= (3, 13):
+            memory = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            memory = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(memory._name, "shared_memory")
+        return FrozenGrams(memory.buf, memory)
+
+    @staticmethod
+    def save(root, filename):
+        with open(filename, 'wb') as f:
+            f.write(FrozenGrams.write(root, bytearray))
+
+    @staticmethod
+    def open(filename):
+        with open(filename, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return FrozenGrams(mapped, mapped)
+
+    @property
+    def name(self):
+        return self.owner.name
+
+    def close(self):
+        # the views must go before the buffer under them can be released
+        self.tokens = self.first_child = self.child_count = self.likelihoods = None
+        self.owner.close()
+
+    def unlink(self):
+        self.owner.unlink()
+
+    def child(self, node, token):
+        if token not in self.ids:
+            return -1
+        start = self.first_child[node]
+        end = start + self.child_count[node]
+        token_id = self.ids[token]
+        at = start + int(np.searchsorted(self.tokens[start:end], token_id))
+        if at < end and self.tokens[at] == token_id:
+            return at
+        return -1
+
+    def find(self, keys):
+        """ returns the index of the node at keys, or -1 """
+        node = 0
+        for key in keys:
+            node = self.child(node, key)
+            if node < 0:
+                break
+        return node
+
+    def has(self, keys):
+        return len(keys) > 0 and self.find(keys) >= 0
+
+    def choices(self, keys, phrase_type):
+        """ (token, likelihood) pairs for the children of the node at keys """
+        node = self.find(keys)
+        if node < 0:
+            return []
+        start = self.first_child[node]
+        end = start + self.child_count[node]
+        return [(self.vocabulary[token_id], likelihood) for token_id, likelihood in
+                zip(self.tokens[start:end].tolist(), self.likelihoods[start:end, phrase_type].tolist())]
@@ -0,0 +1,127 @@
+import phrases, sharedgrams
+
+import os, subprocess, sys, tempfile, time
+from nose.tools import *
+
+
+def make_corpus():
+    corpus = phrases.Corpus()
+    corpus.add_sentences([
+        "hey it works",
+        "hey it made two sentences",
+        "it made something new",
+    ], phrases.DECLARATION)
+    return corpus
+
+
+def test_frozen_matches_tree():
+    corpus = make_corpus()
+    frozen = sharedgrams.FrozenGrams.share(corpus.counts)
+    try:
+        ok_(frozen.has(["hey", "it", "made"]))
+        ok_(not frozen.has(["it", "hey"]))
+        ok_(not frozen.has([]))
+
+        choices = dict(frozen.choices(["hey", "it"], phrases.DECLARATION))
+        eq_(set(choices), {"works", "made"})
+        node = corpus.counts.get(["hey", "it", "made"])
+        eq_(choices["made"], node.likelihood(phrases.DECLARATION))
+    finally:
+        frozen.close()
+        frozen.unlink()
+
+
+def test_attach():
+    frozen = sharedgrams.FrozenGrams.share(make_corpus().counts)
+    try:
+        attached = sharedgrams.FrozenGrams.attach(frozen.name)
+        ok_(attached.has(["made", "something", "new"]))
+        ok_(not attached.tokens.flags.writeable)
+        attached.close()
+    finally:
+        frozen.close()
+        frozen.unlink()
+
+
+def test_attach_from_another_process():
+    frozen = sharedgrams.FrozenGrams.share(make_corpus().counts)
+    try:
+        worker = ("import sharedgrams\n"
+                  "frozen = sharedgrams.FrozenGrams.attach({!r})\n"
+                  "assert frozen.has(['hey', 'it', 'works'])\n"
+                  "frozen.close()\n").format(frozen.name)
+        subprocess.check_call([sys.executable, "-c", worker], cwd=os.path.dirname(os.path.abspath(__file__)))
+
+        # the block must outlive the worker, whose resource tracker would
+        # unlink it shortly after the worker exits
+        time.sleep(0.5)
+        attached = sharedgrams.FrozenGrams.attach(frozen.name)
+        ok_(attached.has(["hey", "it", "works"]))
+        attached.close()
+    finally:
+        frozen.close()
+        frozen.unlink()
+
+
+def test_save_and_open():
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "grams")
+        sharedgrams.FrozenGrams.save(make_corpus().counts, filename)
+        frozen = sharedgrams.FrozenGrams.open(filename)
+        ok_(frozen.has(["hey", "it", "works"]))
+        frozen.close()
+
+
+def test_shared_corpus_learns_privately():
+    frozen = sharedgrams.FrozenGrams.share(make_corpus().counts)
+    try:
+        corpus = phrases.SharedCorpus(frozen)
+        corpus.add_sentence("Hey it works!", phrases.FACT)
+        generated = corpus.generate_sentence(phrases.FACT)
+        ok_(generated.detokenized.startswith("Hey") or generated.detokenized.startswith("It"))
+        ok_(not frozen.has(["works", "!"]))
+    finally:
+        frozen.close()
+        frozen.unlink()
+
+
+def test_shared_corpus_token_budget():
+    frozen = sharedgrams.FrozenGrams.share(make_corpus().counts)
+    try:
+        corpus = phrases.SharedCorpus(frozen, max_tokens=10)
+        corpus.add_sentence(phrases.BEGIN + ["a"] * 8, phrases.FACT)
+        eq_(corpus.max_tokens, 10)
+        ok_(corpus.generate_sentence(phrases.FACT).length <= 10)
+    finally:
+        frozen.close()
+        frozen.unlink()
+
+
+def test_shared_corpus_dedup():
+    frozen = sharedgrams.FrozenGrams.share(make_corpus().counts)
+    try:
+        corpus = phrases.SharedCorpus(frozen, dedup=phrases.DEDUP_SKIP)
+        corpus.add_document("hey it works.")
+        corpus.add_document("hey it works.")
+        eq_(corpus.counts.get(["hey", "it", "works", ".", phrases.END[0]]).occurrences[phrases.DECLARATION], 1)
+        eq_(corpus.dedup_hits, 1)
+    finally:
+        frozen.close()
+        frozen.unlink()
+
+
+def test_generate_chapter_from_shared_models():
+    import chapter, functools
+
+    teacher = sharedgrams.FrozenGrams.share(make_corpus().counts)
+    student = sharedgrams.FrozenGrams.share(make_corpus().counts)
+    try:
+        docs = ["Hey it works, and it made something new for us to consider.\n"] * 20
+        gen = chapter.ChapterGenerator.generate_from_documents(
+            docs, functools.partial(phrases.SharedCorpus, teacher), functools.partial(phrases.SharedCorpus, student))
+        ok_(gen.word_count > 0)
+        ok_(gen.teacher.frozen is teacher and gen.student.frozen is student)
+    finally:
+        for frozen in (teacher, student):
+            frozen.close()
+            frozen.unlink()
@@ -0,0 +1,217 @@
+import json, os, random
+
+import numpy as np
+
+
+def build_suffix_array(ids):
+    """ returns the suffix array of ids (a 1d integer array), built by prefix
+    doubling: suffixes are sorted by their first k tokens, then 2k, until every
+    suffix has a distinct rank """
+    n = len(ids)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    rank = np.unique(ids, return_inverse=True)[1].astype(np.int64)
+    suffixes = np.argsort(rank, kind='stable')
+    k = 1
+    while k < n:
+        # rank of the token k places ahead, -1 when the suffix ends first
+        ahead = np.full(n, -1, dtype=np.int64)
+        ahead[:n - k] = rank[k:]
+        suffixes = np.lexsort((ahead, rank))
+
+        sorted_rank = rank[suffixes]
+        sorted_ahead = ahead[suffixes]
+        changed = np.empty(n, dtype=bool)
+        changed[0] = True
+        changed[1:] = (sorted_rank[1:] != sorted_rank[:-1]) | (sorted_ahead[1:] != sorted_ahead[:-1])
+
+        rank = np.empty(n, dtype=np.int64)
+        rank[suffixes] = np.cumsum(changed) - 1
+        if rank.max() == n - 1:
+            break
+        k *= 2
+    return suffixes
+
+
+class TokenIndex(object):
+    """ Stores every sentence added to a corpus as one stream of integer token ids,
+    along with a parallel array of phrase types and a suffix array over the stream.
+
+    Any context can be looked up by binary searching the suffix array, so there is
+    no limit on how many previous tokens are considered, and memory is linear in
+    the number of tokens. Sentences are followed by the separator token, which is
+    never part of a context, so running into it ends the phrase early.
+
+    Next tokens are weighted by log(occurrences + 1) of that token alone. A GramNode
+    weights a child by the likelihood of its whole subtree instead, which favours
+    tokens with many different continuations; here a context has no fixed depth
+    to sum over, so the two engines do not pick with the same odds.
+
+    Added sentences are buffered, and the next lookup sorts the whole suffix
+    array again, not just the new tokens. A corpus that alternates adding and
+    generating, like the student's during a chapter, pays for one full sort per
+    turn, so this suits a corpus that is mostly built before it is used.
+    """
+
+    TOKEN_DTYPE = np.int32
+    TYPE_DTYPE = np.int8
+
+    def __init__(self, separator):
+        self.separator = separator
+        self.vocabulary = []
+        self.ids = {}
+
+        self.tokens = np.zeros(0, dtype=self.TOKEN_DTYPE)
+        self.types = np.zeros(0, dtype=self.TYPE_DTYPE)
+        self.suffixes = np.zeros(0, dtype=np.int64)
+
+        self.pending_tokens = []
+        self.pending_types = []
+
+    def token_id(self, token):
+        if token not in self.ids:
+            self.ids[token] = len(self.vocabulary)
+            self.vocabulary.append(token)
+        return self.ids[token]
+
+    def add(self, tokens, phrase_type):
+        ids = [self.token_id(t) for t in tokens] + [self.token_id(self.separator)]
+        self.pending_tokens.extend(ids)
+        self.pending_types.extend([phrase_type] * len(ids))
+
+    def build(self):
+        if not self.pending_tokens:
+            return
+        self.tokens = np.concatenate((self.tokens, np.array(self.pending_tokens, dtype=self.TOKEN_DTYPE)))
+        self.types = np.concatenate((self.types, np.array(self.pending_types, dtype=self.TYPE_DTYPE)))
+        self.pending_tokens = []
+        self.pending_types = []
+        self.suffixes = build_suffix_array(self.tokens)
+
+    def context_range(self, context):
+        """ returns (lo, hi) so that suffixes[lo:hi] are exactly the positions
+        where context occurs. context is a list of token ids """
+        self.build()
+        m = len(context)
+        context = tuple(context)
+
+        lo, hi = 0, len(self.suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self.suffixes[mid]
+            if tuple(self.tokens[start:start + m].tolist()) < context:
+                lo = mid + 1
+            else:
+                hi = mid
+        first = lo
+
+        hi = len(self.suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self.suffixes[mid]
+            if tuple(self.tokens[start:start + m].tolist()) <= context:
+                lo = mid + 1
+            else:
+                hi = mid
+        return first, lo
+
+    def lookup(self, keys):
+        """ returns token ids for keys, or None if any key was never seen """
+        if any(k not in self.ids for k in keys):
+            return None
+        return [self.ids[k] for k in keys]
+
+    def has(self, keys):
+        context = self.lookup(keys)
+        if not context:
+            return False
+        lo, hi = self.context_range(context)
+        return hi > lo
+
+    def pick_best(self, keys, phrase_type):
+        """ picks a token following the longest suffix of keys found in the index """
+        while True:
+            context = self.lookup(keys)
+            if context is not None:
+                lo, hi = self.context_range(context)
+                if hi > lo or len(context) == 0:
+                    break
+            keys = keys[1:]
+
+        following = self.suffixes[lo:hi] + len(context)
+        following = following[following < len(self.tokens)]
+        # like a GramNode with no children, only end early if there is nothing else
+        following = following[self.tokens[following] != self.token_id(self.separator)]
+        if len(following) == 0:
+            return self.separator, None
+
+        # fall back to any phrase type if this type cannot continue
+        typed = following[self.types[following] == phrase_type]
+        if len(typed) > 0:
+            following = typed
+
+        choices, counts = np.unique(self.tokens[following], return_counts=True)
+        # take log of occurrences + 1, so that very common continuations do not
+        # completely dominate our phrases. Unlike GramNode, only the next token counts
+        weights = np.log(counts + 1)
+        skip = random.random() * weights.sum()
+        for token_id, weight in zip(choices.tolist(), weights.tolist()):
+            skip -= weight
+            if skip <= 0:
+                return self.vocabulary[token_id], None
+        return self.vocabulary[choices[-1]], None
+
+    def word_set(self):
+        self.build()
+        return {self.vocabulary[i] for i in np.unique(self.tokens).tolist()}
+
+    def delete(self, key):
+        """ replaces key with the separator, so phrases reaching it end early """
+        if key not in self.ids:
+            return
+        self.build()
+        # not in place, as the tokens may be a read-only mapped file
+        self.tokens = np.where(self.tokens == self.ids[key], self.token_id(self.separator), self.tokens).astype(self.TOKEN_DTYPE)
+        self.suffixes = build_suffix_array(self.tokens)
+
+    def to_lower(self, exempt, lower):
+        """ merges every token into its lower cased form unless that form is in exempt """
+        self.build()
+        mapping = np.arange(len(self.vocabulary), dtype=self.TOKEN_DTYPE)
+        for token_id, token in enumerate(list(self.vocabulary)):
+            low = lower(token)
+            if low in exempt or low == token:
+                continue
+            mapping[token_id] = self.token_id(low)
+
+        self.tokens = mapping[self.tokens]
+        self.suffixes = build_suffix_array(self.tokens)
+
+    def show(self, spaces):
+        self.build()
+        for start in self.suffixes.tolist():
+            print("{}-> {}".format(spaces, self.vocabulary[self.tokens[start]]))
+
+    def save(self, directory):
+        """ writes the index as .npy files that load() can map without reading them """
+        self.build()
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "tokens.npy"), self.tokens)
+        np.save(os.path.join(directory, "types.npy"), self.types)
+        np.save(os.path.join(directory, "suffixes.npy"), self.suffixes)
+        with open(os.path.join(directory, "vocabulary.json"), 'w') as out:
+            json.dump({"separator": self.separator, "vocabulary": self.vocabulary}, out)
+
+    @staticmethod
+    def load(directory, mmap_mode='r'):
+        with open(os.path.join(directory, "vocabulary.json")) as f:
+            saved = json.load(f)
+
+        index = TokenIndex(saved["separator"])
+        for token in saved["vocabulary"]:
+            index.token_id(token)
+        index.tokens = np.load(os.path.join(directory, "tokens.npy"), mmap_mode=mmap_mode)
+        index.types = np.load(os.path.join(directory, "types.npy"), mmap_mode=mmap_mode)
+        index.suffixes = np.load(os.path.join(directory, "suffixes.npy"), mmap_mode=mmap_mode)
+        return index
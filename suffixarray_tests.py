@@ -0,0 +1,101 @@
+import phrases, suffixarray
+
+import numpy as np
+import tempfile
+from nose.tools import *
+
+
+def test_suffix_array_is_sorted():
+    ids = np.array([3, 1, 2, 1, 2, 1, 0, 3, 1], dtype=np.int32)
+    suffixes = suffixarray.build_suffix_array(ids)
+    expected = sorted(range(len(ids)), key=lambda i: ids[i:].tolist())
+    eq_(suffixes.tolist(), expected)
+
+
+def test_context_range():
+    index = suffixarray.TokenIndex(-2)
+    index.add(["a", "b", "c"], phrases.FACT)
+    index.add(["a", "b", "d"], phrases.FACT)
+
+    lo, hi = index.context_range(index.lookup(["a", "b"]))
+    eq_(hi - lo, 2)
+    ok_(index.has(["b", "d"]))
+    ok_(not index.has(["c", "a"]))
+
+
+def test_simple_phrase():
+    phrase = "Hey it works!"
+    corpus = phrases.SuffixCorpus()
+    corpus.add_sentence(phrase, phrases.DECLARATION)
+    generated = corpus.generate_sentence(phrases.DECLARATION)
+    eq_(generated.detokenized, phrase)
+    eq_(generated.interrupted, False)
+
+
+def test_long_context():
+    corpus = phrases.SuffixCorpus(gram_length=50)
+    corpus.add_sentences([
+        "one two three four five six seven eight nine ten",
+        "eight nine ten eleven",
+    ], phrases.DECLARATION)
+
+    ok_(corpus.counts.has("two three four five six seven eight nine ten".split()))
+
+
+def test_delete():
+    corpus = phrases.SuffixCorpus()
+    corpus.add_sentences([
+        "hey it works",
+        "hey it made two sentences",
+        "hey it works great",
+        "it made something new",
+    ])
+
+    corpus.counts.delete("it")
+
+    generated = corpus.generate_sentence(phrases.DECLARATION)
+    eq_(generated.detokenized, "Hey")
+    eq_(generated.interrupted, True)
+
+
+def test_fix_casing():
+    corpus = phrases.SuffixCorpus()
+    corpus.add_sentences([
+        "Ringo is a Name",
+        "name is not a Name"
+    ])
+
+    corpus.fix_casing()
+
+    ok_(corpus.counts.has(["Ringo"]))
+    ok_(not corpus.counts.has(["Name"]))
+    ok_(not corpus.counts.has(["is", "a", "Name"]))
+
+
+def test_save_and_load():
+    corpus = phrases.SuffixCorpus()
+    corpus.add_sentence("hey it works", phrases.FACT)
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpus.counts.save(directory)
+        loaded = suffixarray.TokenIndex.load(directory)
+        ok_(loaded.has(["hey", "it", "works"]))
+        eq_(loaded.tokens.tolist(), corpus.counts.tokens.tolist())
+
+
+def test_token_budget():
+    corpus = phrases.SuffixCorpus(max_tokens=10)
+    corpus.add_sentence(phrases.BEGIN + ["a"] * 8, phrases.FACT)
+    generated = corpus.generate_sentence(phrases.FACT)
+    eq_(generated.length, 10)
+    eq_(generated.interrupted, True)
+
+
+def test_dedup():
+    for dedup, expected in ((phrases.DEDUP_BUMP, 2), (phrases.DEDUP_SKIP, 1)):
+        corpus = phrases.SuffixCorpus(dedup=dedup)
+        corpus.add_document("hey it works.")
+        corpus.add_document("hey it works.")
+        lo, hi = corpus.counts.context_range(corpus.counts.lookup(["hey", "it", "works"]))
+        eq_(hi - lo, expected)
+        eq_(corpus.dedup_hits, 1)